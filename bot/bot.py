@@ -11,15 +11,22 @@ import logging
 import os
 import signal
 import sys
-import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 
 import pytz
 
 import db
-from sitemap_parser import fetch_and_parse
-from streak import update_streak
-from discord_webhook import send_article_notification, send_error_alert, send_startup_message
+from sitemap_parser import fetch_and_parse, reset_conditional_cache
+from discord_webhook import (
+    send_article_notification,
+    send_articles_batch_notification,
+    send_error_alert,
+    send_startup_message,
+    set_shutdown_event,
+)
 
 # ─── Logging ────────────────────────────────────────────────────────
 
@@ -66,13 +73,56 @@ def load_config() -> dict:
 
 # ─── Shutdown ────────────────────────────────────────────────────────
 
-shutdown_flag = False
+shutdown_event = threading.Event()
 
 
 def signal_handler(signum, frame):
-    global shutdown_flag
     logger.info("Shutdown signal received...")
-    shutdown_flag = True
+    shutdown_event.set()
+
+
+# ─── Seen-URL Cache ──────────────────────────────────────────────────
+
+SEEN_CACHE_SIZE = 1024
+
+# LRU of URLs known to be in the database, so steady-state polls skip the DB entirely
+_seen: "OrderedDict[str, None]" = OrderedDict()
+
+
+def remember_url(url: str):
+    _seen[url] = None
+    _seen.move_to_end(url)
+    while len(_seen) > SEEN_CACHE_SIZE:
+        _seen.popitem(last=False)
+
+
+def warm_seen_cache():
+    """Preload the LRU with the most recently stored articles."""
+    for url in reversed(db.recent_urls(SEEN_CACHE_SIZE)):
+        remember_url(url)
+    logger.info("Seen-URL cache warmed with %d URLs.", len(_seen))
+
+
+# ─── Notifications ───────────────────────────────────────────────────
+
+# More new articles than this in one poll are announced as a single summary
+BATCH_NOTIFY_THRESHOLD = 3
+
+# Single worker: Discord sends (and their rate-limit waits) run off the polling
+# thread, in order, while the next article's DB write or the next poll proceeds.
+_notifier = ThreadPoolExecutor(max_workers=1, thread_name_prefix="discord")
+
+
+def _log_notify_failure(future: Future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Notification failed: %r", exc, exc_info=exc)
+
+
+def notify(send_fn, **kwargs):
+    """Queue a discord_webhook send on the background notifier."""
+    future = _notifier.submit(send_fn, **kwargs)
+    future.add_done_callback(_log_notify_failure)
 
 
 # ─── Test Mode ───────────────────────────────────────────────────────
@@ -101,61 +151,98 @@ def run_test(config: dict):
 
 # ─── Main Loop ───────────────────────────────────────────────────────
 
+def announce_articles(config: dict, recorded: list):
+    """Queue Discord notifications for (article, stats) pairs recorded in one poll."""
+    if not recorded:
+        return
+    article_value = config["article_value_usd"]
+
+    if len(recorded) > BATCH_NOTIFY_THRESHOLD:
+        # One summary message instead of a webhook per article
+        stats = recorded[-1][1]
+        notify(
+            send_articles_batch_notification,
+            webhook_url=config["discord_webhook_url"],
+            articles=[(article.title, article.url) for article, _ in recorded],
+            article_value=article_value,
+            today_count=stats["today_count"],
+            daily_target=config["daily_target"],
+            monthly_count=stats["monthly_count"],
+            monthly_target=config["monthly_target"],
+            streak=stats["streak"],
+            today_earned=stats["today_earned"],
+            monthly_earned=stats["monthly_earned"],
+            user_id=config["discord_user_id"],
+            dashboard_url=config["dashboard_url"],
+        )
+    else:
+        for article, stats in recorded:
+            notify(
+                send_article_notification,
+                webhook_url=config["discord_webhook_url"],
+                article_title=article.title,
+                article_url=article.url,
+                article_value=article_value,
+                today_count=stats["today_count"],
+                daily_target=config["daily_target"],
+                monthly_count=stats["monthly_count"],
+                monthly_target=config["monthly_target"],
+                streak=stats["streak"],
+                today_earned=stats["today_earned"],
+                monthly_earned=stats["monthly_earned"],
+                user_id=config["discord_user_id"],
+                dashboard_url=config["dashboard_url"],
+            )
+
+
 def poll_cycle(config: dict, tz) -> int:
     """Execute one polling cycle. Returns new article count or -1 on failure."""
     articles = fetch_and_parse(config["sitemap_url"])
     if articles is None:
         return -1
 
-    new_count = 0
     article_value = config["article_value_usd"]
 
+    candidates = []
     for article in articles:
-        if db.is_known_url(article.url):
-            continue
-
-        logger.info(f"🆕 New article: {article.title}")
+        if article.url in _seen:
+            _seen.move_to_end(article.url)
+        else:
+            candidates.append(article)
+    if not candidates:
+        return 0
 
-        # Update streak
-        streak = update_streak(tz)
+    known = db.known_urls([article.url for article in candidates])
 
-        # Insert article into database
-        db.insert_article(
-            url=article.url,
-            title=article.title,
-            published_at=None,  # Sitemap date could be parsed here
-            earning=article_value,
-            tz=tz,
-        )
+    # One clock read per poll; every article in this cycle is booked on the same day
+    now = datetime.now(tz)
 
-        # Get updated counts
-        today_count = db.get_today_count(tz)
-        today_earned = db.get_today_earned(tz)
-        monthly_count = db.get_monthly_count(tz)
-        monthly_earned = db.get_monthly_earned(tz)
-
-        # Send Discord notification
-        send_article_notification(
-            webhook_url=config["discord_webhook_url"],
-            article_title=article.title,
-            article_url=article.url,
-            article_value=article_value,
-            today_count=today_count,
-            daily_target=config["daily_target"],
-            monthly_count=monthly_count,
-            monthly_target=config["monthly_target"],
-            streak=streak,
-            today_earned=today_earned,
-            monthly_earned=monthly_earned,
-            user_id=config["discord_user_id"],
-            dashboard_url=config["dashboard_url"],
-        )
-
-        new_count += 1
-        if new_count > 1:
-            time.sleep(1)
-
-    return new_count
+    recorded = []  # (article, stats) for every article inserted this cycle
+    try:
+        for article in candidates:
+            if article.url in known:
+                remember_url(article.url)
+                continue
+
+            # Insert article + update stats/streak in one round-trip
+            stats = db.record_article_atomic(
+                url=article.url,
+                title=article.title,
+                earning=article_value,
+                tz=tz,
+                now=now,
+            )
+            remember_url(article.url)
+            if stats is None:
+                continue  # Inserted concurrently since the known_urls check
+
+            logger.info("🆕 New article: %s", article.title)
+            recorded.append((article, stats))
+    finally:
+        # Articles already committed are announced even if a later insert raised
+        announce_articles(config, recorded)
+
+    return len(recorded)
 
 
 def main():
@@ -176,7 +263,7 @@ def main():
     try:
         tz = pytz.timezone(config["timezone"])
     except pytz.exceptions.UnknownTimeZoneError:
-        logger.error(f"Unknown timezone: {config['timezone']}. Using UTC.")
+        logger.error("Unknown timezone: %s. Using UTC.", config["timezone"])
         tz = pytz.UTC
 
     # Init database
@@ -188,9 +275,12 @@ def main():
         run_test(config)
         return
 
+    warm_seen_cache()
+
     # Shutdown handler
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    set_shutdown_event(shutdown_event)
 
     # Startup message
     config_summary = (
@@ -201,7 +291,7 @@ def main():
         f"Poll interval: {config['poll_interval']}s\n"
         f"Dashboard: {config['dashboard_url']}"
     )
-    logger.info(f"\n{config_summary}")
+    logger.info("\n%s", config_summary)
 
     send_startup_message(
         config["discord_webhook_url"],
@@ -215,20 +305,21 @@ def main():
     max_failures = 3
     poll_interval = config["poll_interval"]
 
-    logger.info(f"Starting polling (every {poll_interval}s)...")
+    logger.info("Starting polling (every %ss)...", poll_interval)
 
-    while not shutdown_flag:
+    while not shutdown_event.is_set():
         try:
             now_str = datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S %Z")
-            logger.info(f"--- Poll @ {now_str} ---")
+            logger.info("--- Poll @ %s ---", now_str)
 
             result = poll_cycle(config, tz)
 
             if result == -1:
                 consecutive_failures += 1
-                logger.warning(f"Poll failed ({consecutive_failures}/{max_failures})")
+                logger.warning("Poll failed (%d/%d)", consecutive_failures, max_failures)
                 if consecutive_failures >= max_failures:
-                    send_error_alert(
+                    notify(
+                        send_error_alert,
                         webhook_url=config["discord_webhook_url"],
                         error_msg=f"Sitemap fetch failed {consecutive_failures}x in a row.",
                         consecutive_failures=consecutive_failures,
@@ -238,20 +329,21 @@ def main():
             else:
                 consecutive_failures = 0
                 if result > 0:
-                    logger.info(f"✅ {result} new article(s)!")
+                    logger.info("✅ %d new article(s)!", result)
                 else:
                     logger.info("No new articles.")
 
         except Exception as e:
-            logger.exception(f"Unexpected error: {e}")
+            logger.exception("Unexpected error: %s", e)
             consecutive_failures += 1
+            # The sitemap may not have been fully processed; don't let a 304 skip it next time
+            reset_conditional_cache()
 
-        # Interruptible sleep
-        for _ in range(poll_interval):
-            if shutdown_flag:
-                break
-            time.sleep(1)
+        # Interruptible sleep: returns immediately once a signal sets the event
+        shutdown_event.wait(timeout=poll_interval)
 
+    logger.info("Flushing pending notifications...")
+    _notifier.shutdown(wait=True)
     logger.info("Bot stopped. Goodbye! 👋")
 
 
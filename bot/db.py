@@ -6,10 +6,12 @@ Handles connection, table creation, and all queries for the article tracker.
 
 import logging
 import os
+from contextlib import contextmanager
 from datetime import datetime, date
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import connection as PgConnection
+from psycopg2.pool import ThreadedConnectionPool
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +32,19 @@ CREATE TABLE IF NOT EXISTS daily_stats (
     earned NUMERIC(10,2) DEFAULT 0
 );
 
+-- Running per-month totals (month = first day of the month), kept in step with
+-- daily_stats so monthly figures are a single-row lookup
+CREATE TABLE IF NOT EXISTS monthly_stats (
+    month DATE PRIMARY KEY,
+    article_count INTEGER DEFAULT 0,
+    earned NUMERIC(12,2) DEFAULT 0
+);
+
+-- Newest-first article listing. Deliberately not covering: title/url are
+-- unbounded TEXT and could exceed the btree tuple size limit, and the list is
+-- only 20 heap fetches. daily_stats date ranges are served by its primary key.
+CREATE INDEX IF NOT EXISTS idx_articles_detected_at ON articles (detected_at DESC);
+
 CREATE TABLE IF NOT EXISTS streak_info (
     id INTEGER PRIMARY KEY DEFAULT 1,
     current_streak INTEGER DEFAULT 0,
@@ -40,55 +55,191 @@ CREATE TABLE IF NOT EXISTS streak_info (
 INSERT INTO streak_info (id, current_streak, last_publish_date)
 VALUES (1, 0, NULL)
 ON CONFLICT (id) DO NOTHING;
+
+-- Rebuild monthly_stats from daily_stats (backfills existing databases)
+INSERT INTO monthly_stats (month, article_count, earned)
+SELECT date_trunc('month', date)::date, SUM(article_count), SUM(earned)
+FROM daily_stats
+GROUP BY 1
+ON CONFLICT (month) DO UPDATE
+SET article_count = EXCLUDED.article_count,
+    earned = EXCLUDED.earned;
 """
 
 
-def get_connection():
-    """Get a new database connection from DATABASE_URL env var."""
-    database_url = os.environ.get("DATABASE_URL")
-    if not database_url:
-        raise ValueError("DATABASE_URL environment variable not set")
-    return psycopg2.connect(database_url)
+# Calendar streak rule, applied in RECORD_ARTICLE: same day keeps the streak,
+# the day after extends it, anything else (including no previous publish)
+# restarts at 1.
+_STREAK_CASE = """CASE
+            WHEN last_publish_date = %(today)s THEN GREATEST(current_streak, 1)
+            WHEN last_publish_date = %(today)s - 1 THEN current_streak + 1
+            ELSE 1
+        END"""
+
+# Insert an article and bump every counter in one round-trip. Each data-modifying
+# CTE only fires when the article row was actually inserted (SELECT ... FROM ins),
+# so a URL that is already known leaves the stats untouched and returns no row.
+RECORD_ARTICLE = f"""
+WITH ins AS (
+    INSERT INTO articles (url, title, published_at, detected_at, earning)
+    VALUES (%(url)s, %(title)s, %(published_at)s, %(now)s, %(earning)s)
+    ON CONFLICT (url) DO NOTHING
+    RETURNING earning
+),
+ds AS (
+    INSERT INTO daily_stats (date, article_count, earned)
+    SELECT %(today)s, 1, earning FROM ins
+    ON CONFLICT (date) DO UPDATE
+    SET article_count = daily_stats.article_count + 1,
+        earned = daily_stats.earned + EXCLUDED.earned
+    RETURNING article_count, earned
+),
+st AS (
+    UPDATE streak_info
+    SET current_streak = {_STREAK_CASE},
+        last_publish_date = %(today)s
+    WHERE id = 1 AND EXISTS (SELECT 1 FROM ins)
+    RETURNING current_streak
+),
+ms AS (
+    INSERT INTO monthly_stats (month, article_count, earned)
+    SELECT %(first_of_month)s, 1, earning FROM ins
+    ON CONFLICT (month) DO UPDATE
+    SET article_count = monthly_stats.article_count + 1,
+        earned = monthly_stats.earned + EXCLUDED.earned
+    RETURNING article_count, earned
+)
+SELECT ds.article_count, ds.earned, ms.article_count, ms.earned, st.current_streak
+FROM ds, ms, st
+"""
 
 
-def init_db():
-    """Create tables if they don't exist."""
-    conn = get_connection()
+# Hot read queries, parsed and planned once per pooled connection
+PREPARE_STATEMENTS = """
+PREPARE is_known(text) AS SELECT 1 FROM articles WHERE url = $1;
+PREPARE known_urls(text[]) AS SELECT url FROM articles WHERE url = ANY($1);
+PREPARE today_count(date) AS SELECT article_count FROM daily_stats WHERE date = $1;
+PREPARE today_earned(date) AS SELECT earned FROM daily_stats WHERE date = $1;
+PREPARE monthly_count(date) AS SELECT COALESCE((SELECT article_count FROM monthly_stats WHERE month = $1), 0);
+PREPARE monthly_earned(date) AS SELECT COALESCE((SELECT earned FROM monthly_stats WHERE month = $1), 0);
+"""
+
+
+class _PreparedConnection(PgConnection):
+    """psycopg2 connection that remembers whether PREPARE_STATEMENTS ran on it."""
+    prepared = False
+
+
+POOL_MIN_CONN = 1
+POOL_MAX_CONN = 8
+
+_pool: ThreadedConnectionPool | None = None
+
+
+def _get_pool() -> ThreadedConnectionPool:
+    """Create the connection pool from DATABASE_URL env var on first use."""
+    global _pool
+    if _pool is None:
+        database_url = os.environ.get("DATABASE_URL")
+        if not database_url:
+            raise ValueError("DATABASE_URL environment variable not set")
+        _pool = ThreadedConnectionPool(
+            POOL_MIN_CONN, POOL_MAX_CONN, dsn=database_url, connection_factory=_PreparedConnection,
+        )
+    return _pool
+
+
+@contextmanager
+def _conn(prepare: bool = True):
+    """
+    Borrow a pooled connection; broken connections are discarded, not reused.
+
+    The first checkout of each connection runs PREPARE_STATEMENTS, which needs
+    the tables to exist, so init_db borrows with prepare=False.
+    """
+    pool = _get_pool()
+    conn = pool.getconn()
+    broken = False
     try:
+        if prepare and not conn.prepared:
+            with conn.cursor() as cur:
+                cur.execute(PREPARE_STATEMENTS)
+            conn.commit()
+            conn.prepared = True
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, close=broken or bool(conn.closed))
+
+
+def init_db():
+    """Create the connection pool and tables if they don't exist."""
+    with _conn(prepare=False) as conn:
         with conn.cursor() as cur:
             cur.execute(CREATE_TABLES)
         conn.commit()
         logger.info("Database tables initialized.")
-    finally:
-        conn.close()
 
 
 def is_known_url(url: str) -> bool:
-    """Check if an article URL already exists in the database."""
-    conn = get_connection()
-    try:
+    """
+    Check if a single article URL already exists.
+
+    Not used on the polling path: known_urls() batches the pre-filter and the
+    inserts themselves detect duplicates via ON CONFLICT ... RETURNING.
+    """
+    with _conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT 1 FROM articles WHERE url = %s", (url,))
+            cur.execute("EXECUTE is_known(%s)", (url,))
             return cur.fetchone() is not None
-    finally:
-        conn.close()
 
 
-def insert_article(url: str, title: str, published_at: datetime | None, earning: float, tz) -> None:
-    """Insert a new article and update daily stats."""
-    now = datetime.now(tz)
+def known_urls(urls: list[str]) -> set[str]:
+    """Return the subset of urls that already exist in the database (one query)."""
+    if not urls:
+        return set()
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("EXECUTE known_urls(%s)", (urls,))
+            return {row[0] for row in cur}
+
+
+def recent_urls(n: int) -> list[str]:
+    """Get the URLs of the n most recently inserted articles, newest first."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT url FROM articles ORDER BY id DESC LIMIT %s", (n,))
+            return [row[0] for row in cur]
+
+
+def insert_article(
+    url: str, title: str, published_at: datetime | None, earning: float, tz, now: datetime | None = None,
+) -> bool:
+    """
+    Insert a new article and update daily stats.
+
+    Returns:
+        True if the article was inserted, False if the URL was already known
+        (daily stats are left untouched in that case).
+    """
+    now = now or datetime.now(tz)
     today = now.date()
 
-    conn = get_connection()
-    try:
+    with _conn() as conn:
         with conn.cursor() as cur:
-            # Insert article
+            # Insert article; ON CONFLICT is the authoritative "already known" check
             cur.execute(
                 """INSERT INTO articles (url, title, published_at, detected_at, earning)
                    VALUES (%s, %s, %s, %s, %s)
-                   ON CONFLICT (url) DO NOTHING""",
+                   ON CONFLICT (url) DO NOTHING
+                   RETURNING id""",
                 (url, title, published_at, now, earning),
             )
+            if cur.fetchone() is None:
+                conn.rollback()
+                return False
 
             # Upsert daily stats
             cur.execute(
@@ -99,115 +250,124 @@ def insert_article(url: str, title: str, published_at: datetime | None, earning:
                        earned = daily_stats.earned + %s""",
                 (today, earning, earning),
             )
+
+            # Upsert monthly stats
+            cur.execute(
+                """INSERT INTO monthly_stats (month, article_count, earned)
+                   VALUES (%s, 1, %s)
+                   ON CONFLICT (month) DO UPDATE
+                   SET article_count = monthly_stats.article_count + 1,
+                       earned = monthly_stats.earned + %s""",
+                (today.replace(day=1), earning, earning),
+            )
         conn.commit()
-        logger.info(f"Article inserted: {title}")
-    finally:
-        conn.close()
+        logger.info("Article inserted: %s", title)
+        return True
 
 
-def get_today_count(tz) -> int:
-    """Get article count for today."""
-    today = datetime.now(tz).date()
-    conn = get_connection()
-    try:
+def record_article_atomic(
+    url: str, title: str, earning: float, tz, published_at: datetime | None = None, now: datetime | None = None,
+) -> dict | None:
+    """
+    Insert a new article and update daily stats and streak in a single statement.
+
+    Returns:
+        Dict with today_count, today_earned, monthly_count, monthly_earned and
+        streak, or None if the URL was already known.
+    """
+    now = now or datetime.now(tz)
+    today = now.date()
+
+    with _conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT article_count FROM daily_stats WHERE date = %s", (today,))
+            cur.execute(
+                RECORD_ARTICLE,
+                {
+                    "url": url,
+                    "title": title,
+                    "published_at": published_at,
+                    "now": now,
+                    "earning": earning,
+                    "today": today,
+                    "first_of_month": today.replace(day=1),
+                },
+            )
+            row = cur.fetchone()
+        conn.commit()
+
+    if row is None:
+        return None
+
+    logger.info("Article inserted: %s", title)
+    return {
+        "today_count": row[0],
+        "today_earned": float(row[1]),
+        "monthly_count": row[2],
+        "monthly_earned": float(row[3]),
+        "streak": row[4],
+    }
+
+
+def get_today_count(tz, today: date | None = None) -> int:
+    """Get article count for today (pass `today` to reuse a date computed once per poll)."""
+    today = today or datetime.now(tz).date()
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("EXECUTE today_count(%s)", (today,))
             row = cur.fetchone()
             return row[0] if row else 0
-    finally:
-        conn.close()
 
 
-def get_today_earned(tz) -> float:
-    """Get total earnings for today."""
-    today = datetime.now(tz).date()
-    conn = get_connection()
-    try:
+def get_today_earned(tz, today: date | None = None) -> float:
+    """Get total earnings for today (pass `today` to reuse a date computed once per poll)."""
+    today = today or datetime.now(tz).date()
+    with _conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT earned FROM daily_stats WHERE date = %s", (today,))
+            cur.execute("EXECUTE today_earned(%s)", (today,))
             row = cur.fetchone()
             return float(row[0]) if row else 0.0
-    finally:
-        conn.close()
 
 
-def get_monthly_count(tz) -> int:
+def get_monthly_count(tz, first_of_month: date | None = None) -> int:
     """Get total article count for the current month."""
-    now = datetime.now(tz)
-    first_of_month = now.replace(day=1).date()
-    conn = get_connection()
-    try:
+    first_of_month = first_of_month or datetime.now(tz).date().replace(day=1)
+    with _conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                "SELECT COALESCE(SUM(article_count), 0) FROM daily_stats WHERE date >= %s",
-                (first_of_month,),
-            )
+            cur.execute("EXECUTE monthly_count(%s)", (first_of_month,))
             return cur.fetchone()[0]
-    finally:
-        conn.close()
 
 
-def get_monthly_earned(tz) -> float:
+def get_monthly_earned(tz, first_of_month: date | None = None) -> float:
     """Get total earnings for the current month."""
-    now = datetime.now(tz)
-    first_of_month = now.replace(day=1).date()
-    conn = get_connection()
-    try:
+    first_of_month = first_of_month or datetime.now(tz).date().replace(day=1)
+    with _conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                "SELECT COALESCE(SUM(earned), 0) FROM daily_stats WHERE date >= %s",
-                (first_of_month,),
-            )
+            cur.execute("EXECUTE monthly_earned(%s)", (first_of_month,))
             return float(cur.fetchone()[0])
-    finally:
-        conn.close()
 
 
 def get_total_earned() -> float:
     """Get all-time total earnings."""
-    conn = get_connection()
-    try:
+    with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute("SELECT COALESCE(SUM(earning), 0) FROM articles")
             return float(cur.fetchone()[0])
-    finally:
-        conn.close()
 
 
 def get_total_articles() -> int:
     """Get all-time article count."""
-    conn = get_connection()
-    try:
+    with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute("SELECT COUNT(*) FROM articles")
             return cur.fetchone()[0]
-    finally:
-        conn.close()
 
 
 def get_streak() -> tuple[int, date | None]:
     """Get current streak and last publish date."""
-    conn = get_connection()
-    try:
+    with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute("SELECT current_streak, last_publish_date FROM streak_info WHERE id = 1")
             row = cur.fetchone()
             if row:
                 return row[0], row[1]
             return 0, None
-    finally:
-        conn.close()
-
-
-def update_streak(streak: int, last_publish_date: date) -> None:
-    """Update streak info."""
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """UPDATE streak_info SET current_streak = %s, last_publish_date = %s WHERE id = 1""",
-                (streak, last_publish_date),
-            )
-        conn.commit()
-    finally:
-        conn.close()
@@ -6,9 +6,12 @@ Includes a "View Dashboard" link button component.
 """
 
 import logging
+import random
+import threading
 import time
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from progress import make_progress_bar, format_earning_increment, calculate_daily_remaining, format_total_earned
 
@@ -16,6 +19,115 @@ logger = logging.getLogger(__name__)
 
 MAX_RETRIES = 3
 BASE_DELAY = 2
+MAX_BACKOFF = 30
+
+# Retry backoff waits on this instead of sleeping, so shutdown cuts it short.
+# bot.py swaps in its own shutdown event via set_shutdown_event().
+_shutdown_event = threading.Event()
+
+# Characters of title/URL lines in a batch summary (Discord caps content at 2000)
+BATCH_LIST_BUDGET = 1200
+BATCH_TITLE_MAX = 200  # per title, so one long headline cannot crowd out the rest
+
+# Keep-alive session: notification bursts reuse one TCP/TLS connection to Discord
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+# time.monotonic() deadline until which Discord reported an exhausted rate-limit bucket
+_rate_limit_reset_at = 0.0
+
+# Shared top and bottom of the article and batch notifications, filled with
+# str.format_map() on every send
+_STATS_HEADER = (
+    "📊  **Today: {today_count} / {daily_target} Articles**\n"
+    "💸  + ${earned_now:,.2f} ({earned_now_label})\n"
+    "💰  Earned Today: **${today_earned:,.2f}**\n"
+    "💵  Earned This Month: **${monthly_earned:,.2f}**\n"
+    "\n"
+    "━━━━━━━━━━━━━━━━━━━━\n"
+    "\n"
+)
+_PROGRESS_FOOTER = (
+    "\n"
+    "━━━━━━━━━━━━━━━━━━━━\n"
+    "\n"
+    "`{daily_bar}`\n"
+    "{goal_line}\n"
+    "🔥  Streak: **{streak} Day{streak_plural}**\n"
+    "\n"
+    "📈  **Monthly Progress**\n"
+    "`{monthly_bar}`\n"
+    "**{monthly_count} / {monthly_target}** Articles\n"
+    "\n{mention}"
+)
+
+_ARTICLE_TEMPLATE = (
+    _STATS_HEADER
+    + "🚀  **ARTICLE PUBLISHED**\n"
+    "📰  {article_title}\n"
+    "🔗  {article_url}\n"
+    + _PROGRESS_FOOTER
+)
+
+_BATCH_TEMPLATE = (
+    _STATS_HEADER
+    + "🚀  **{count} ARTICLES PUBLISHED**\n"
+    "{article_list}\n"
+    + _PROGRESS_FOOTER
+)
+
+
+def _goal_line(daily_remaining: int) -> str:
+    if daily_remaining > 0:
+        return f"🎯  {daily_remaining} More To Daily Goal"
+    return "🎯  ✅ Daily Goal Reached!"
+
+
+def _shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _article_list(articles: list[tuple[str, str]]) -> str:
+    """Bullet title/URL pairs, cut off with '…and N more' once BATCH_LIST_BUDGET is used."""
+    lines = []
+    used = 0
+    for i, (title, url) in enumerate(articles):
+        line = f"📰  {_shorten(title, BATCH_TITLE_MAX)}\n🔗  <{url}>"
+        if lines and used + len(line) > BATCH_LIST_BUDGET:
+            lines.append(f"…and {len(articles) - i} more")
+            break
+        # The first entry is always listed, so it alone must fit the budget
+        line = _shorten(line, BATCH_LIST_BUDGET)
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
+
+
+def _progress_fields(
+    today_count: int,
+    daily_target: int,
+    monthly_count: int,
+    monthly_target: int,
+    streak: int,
+    today_earned: float,
+    monthly_earned: float,
+    user_id: str,
+) -> dict:
+    """Values for the _STATS_HEADER/_PROGRESS_FOOTER placeholders."""
+    return {
+        "today_count": today_count,
+        "daily_target": daily_target,
+        "today_earned": today_earned,
+        "monthly_earned": monthly_earned,
+        "daily_bar": make_progress_bar(today_count, daily_target),
+        "goal_line": _goal_line(calculate_daily_remaining(today_count, daily_target)),
+        "streak": streak,
+        "streak_plural": "s" if streak != 1 else "",
+        "monthly_bar": make_progress_bar(monthly_count, monthly_target),
+        "monthly_count": monthly_count,
+        "monthly_target": monthly_target,
+        "mention": _mention(user_id),
+    }
 
 
 def _mention(user_id: str) -> str:
@@ -59,43 +171,58 @@ def send_article_notification(
     dashboard_url: str = "",
 ):
     """Send a plain text Discord notification for a newly detected article."""
-    daily_remaining = calculate_daily_remaining(today_count, daily_target)
-    daily_bar = make_progress_bar(today_count, daily_target)
-    monthly_bar = make_progress_bar(monthly_count, monthly_target)
-    mention = _mention(user_id)
+    fields = _progress_fields(
+        today_count, daily_target, monthly_count, monthly_target,
+        streak, today_earned, monthly_earned, user_id,
+    )
+    message = _ARTICLE_TEMPLATE.format_map({
+        **fields,
+        "earned_now": article_value,
+        "earned_now_label": "this article",
+        "article_title": article_title,
+        "article_url": article_url,
+    })
 
-    if daily_remaining > 0:
-        goal_line = f"🎯  {daily_remaining} More To Daily Goal"
-    else:
-        goal_line = "🎯  ✅ Daily Goal Reached!"
+    payload = {"content": message.strip()}
 
-    message = (
-        f"📊  **Today: {today_count} / {daily_target} Articles**\n"
-        f"💸  + ${article_value:,.2f} (this article)\n"
-        f"💰  Earned Today: **${today_earned:,.2f}**\n"
-        f"💵  Earned This Month: **${monthly_earned:,.2f}**\n"
-        f"\n"
-        f"━━━━━━━━━━━━━━━━━━━━\n"
-        f"\n"
-        f"🚀  **ARTICLE PUBLISHED**\n"
-        f"📰  {article_title}\n"
-        f"🔗  {article_url}\n"
-        f"\n"
-        f"━━━━━━━━━━━━━━━━━━━━\n"
-        f"\n"
-        f"`{daily_bar}`\n"
-        f"{goal_line}\n"
-        f"🔥  Streak: **{streak} Day{'s' if streak != 1 else ''}**\n"
-        f"\n"
-        f"📈  **Monthly Progress**\n"
-        f"`{monthly_bar}`\n"
-        f"**{monthly_count} / {monthly_target}** Articles\n"
-        f"\n{mention}"
+    # Add dashboard button
+    button = _dashboard_button(dashboard_url)
+    if button:
+        payload["components"] = button
+
+    _send_webhook(webhook_url, payload)
+
+
+def send_articles_batch_notification(
+    webhook_url: str,
+    articles: list[tuple[str, str]],
+    article_value: float,
+    today_count: int,
+    daily_target: int,
+    monthly_count: int,
+    monthly_target: int,
+    streak: int,
+    today_earned: float,
+    monthly_earned: float,
+    user_id: str = "",
+    dashboard_url: str = "",
+):
+    """Send one plain text summary for a burst of newly detected (title, url) articles."""
+    count = len(articles)
+    fields = _progress_fields(
+        today_count, daily_target, monthly_count, monthly_target,
+        streak, today_earned, monthly_earned, user_id,
     )
+    message = _BATCH_TEMPLATE.format_map({
+        **fields,
+        "earned_now": article_value * count,
+        "earned_now_label": f"{count} articles",
+        "count": count,
+        "article_list": _article_list(articles),
+    })
 
     payload = {"content": message.strip()}
 
-    # Add dashboard button
     button = _dashboard_button(dashboard_url)
     if button:
         payload["components"] = button
@@ -133,25 +260,58 @@ def send_startup_message(webhook_url: str, config_summary: str, user_id: str = "
     _send_webhook(webhook_url, payload)
 
 
+def set_shutdown_event(event: threading.Event):
+    """Abort pending webhook retries once `event` is set."""
+    global _shutdown_event
+    _shutdown_event = event
+
+
+def _wait_for_rate_limit():
+    """Sleep until the bucket resets if the previous response said it was empty."""
+    delay = _rate_limit_reset_at - time.monotonic()
+    if delay > 0:
+        logger.info("Rate limit bucket empty. Waiting %.2fs before sending...", delay)
+        time.sleep(delay)
+
+
+def _track_rate_limit(response: requests.Response):
+    """Remember when the bucket resets if Discord says no requests remain."""
+    global _rate_limit_reset_at
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    reset_after = response.headers.get("X-RateLimit-Reset-After")
+    if remaining is None or reset_after is None:
+        return
+    try:
+        if int(remaining) == 0:
+            _rate_limit_reset_at = time.monotonic() + float(reset_after)
+    except ValueError:
+        logger.debug("Unparseable rate limit headers: %r, %r", remaining, reset_after)
+
+
 def _send_webhook(webhook_url: str, payload: dict):
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            response = requests.post(webhook_url, json=payload, timeout=15)
+            _wait_for_rate_limit()
+            response = _session.post(webhook_url, json=payload, timeout=15)
 
             if response.status_code == 429:
                 retry_after = response.json().get("retry_after", 5)
-                logger.warning(f"Rate limited. Retrying after {retry_after}s...")
+                logger.warning("Rate limited. Retrying after %ss...", retry_after)
                 time.sleep(retry_after)
                 continue
 
             response.raise_for_status()
+            _track_rate_limit(response)
             logger.info("Discord webhook sent successfully.")
             return
 
         except requests.RequestException as e:
-            delay = BASE_DELAY ** attempt
-            logger.warning(f"Webhook attempt {attempt}/{MAX_RETRIES} failed: {e}")
+            logger.warning("Webhook attempt %d/%d failed: %s", attempt, MAX_RETRIES, e)
             if attempt < MAX_RETRIES:
-                time.sleep(delay)
+                # Exponential backoff (2s, 4s, ...) capped at MAX_BACKOFF, plus jitter
+                delay = min(MAX_BACKOFF, BASE_DELAY * 2 ** (attempt - 1)) + random.uniform(0, 0.5)
+                if _shutdown_event.wait(timeout=delay):
+                    logger.warning("Shutdown requested. Giving up on webhook retries.")
+                    return
             else:
-                logger.error(f"Webhook delivery failed after {MAX_RETRIES} attempts.")
+                logger.error("Webhook delivery failed after %d attempts.", MAX_RETRIES)
@@ -2,7 +2,10 @@
 progress.py — Progress bar generation and earnings formatting.
 """
 
+from functools import lru_cache
 
+
+@lru_cache(maxsize=512)
 def make_progress_bar(current: int, target: int, length: int = 10) -> str:
     """
     Generate a text-based progress bar.
@@ -7,10 +7,13 @@ Fetches the news-sitemap.xml and extracts article URLs, titles, and dates.
 import logging
 import time
 from dataclasses import dataclass, field
-from typing import List, Optional
+from io import BytesIO
+from typing import BinaryIO, List, Optional, Union
 
 import requests
+import urllib3
 from lxml import etree
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +22,16 @@ NAMESPACES = {
     "news": "http://www.google.com/schemas/sitemap-news/0.9",
 }
 
+# Clark-notation ({uri}local) tags, resolved once instead of per findtext() call
+_SM = f"{{{NAMESPACES['sm']}}}"
+_NEWS = f"{{{NAMESPACES['news']}}}"
+URL_TAG = f"{_SM}url"
+LOC_TAG = f"{_SM}loc"
+NEWS_TAG = f"{_NEWS}news"
+NEWS_TITLE_TAG = f"{_NEWS}title"
+NEWS_DATE_TAG = f"{_NEWS}publication_date"
+NEWS_KEYWORDS_TAG = f"{_NEWS}keywords"
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                   "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -28,6 +41,19 @@ HEADERS = {
 
 REQUEST_TIMEOUT = 30
 
+# Keep-alive session: the TCP/TLS connection to the sitemap host is reused across polls
+_session = requests.Session()
+_session.headers.update(HEADERS)
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+# Returned by fetch_sitemap when the server answers 304 Not Modified
+NOT_MODIFIED = object()
+
+# Validators from the last successful fetch, sent back as a conditional GET
+_last_etag: Optional[str] = None
+_last_modified: Optional[str] = None
+
 
 @dataclass
 class Article:
@@ -37,56 +63,127 @@ class Article:
     keywords: List[str] = field(default_factory=list)
 
 
-def fetch_sitemap(sitemap_url: str) -> Optional[bytes]:
+def reset_conditional_cache():
+    """Forget the stored ETag/Last-Modified so the next fetch downloads the full sitemap."""
+    global _last_etag, _last_modified
+    _last_etag = None
+    _last_modified = None
+
+
+def fetch_sitemap(sitemap_url: str) -> Union[requests.Response, object, None]:
+    """
+    Fetch the sitemap with a conditional, streamed GET.
+
+    Returns the open response (body not yet read; the caller must close it),
+    NOT_MODIFIED on a 304, or None on failure.
+    """
+    global _last_etag, _last_modified
+
     # Add timestamp to bust CDN cache (WordPress W3 Total Cache caches for 24h)
     cache_buster = f"{'&' if '?' in sitemap_url else '?'}_cb={int(time.time())}"
     url = sitemap_url + cache_buster
+
+    headers = {}
+    if _last_etag:
+        headers["If-None-Match"] = _last_etag
+    if _last_modified:
+        headers["If-Modified-Since"] = _last_modified
+
     try:
-        response = requests.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        logger.debug(f"Sitemap fetched: {len(response.content)} bytes")
-        return response.content
+        response = _session.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True)
+        if response.status_code == 304:
+            response.close()
+            logger.debug("Sitemap not modified")
+            return NOT_MODIFIED
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
+        _last_etag = response.headers.get("ETag")
+        _last_modified = response.headers.get("Last-Modified")
+        logger.debug("Sitemap response received: %s bytes", response.headers.get("Content-Length", "?"))
+        return response
     except requests.RequestException as e:
-        logger.error(f"Failed to fetch sitemap: {e}")
+        logger.error("Failed to fetch sitemap: %s", e)
         return None
 
 
-def parse_sitemap(xml_content: bytes) -> List[Article]:
-    articles = []
-    try:
-        root = etree.fromstring(xml_content)
-    except etree.XMLSyntaxError as e:
-        logger.error(f"Failed to parse sitemap XML: {e}")
-        return articles
+def _parse_url_element(url_el) -> Optional[Article]:
+    loc = (url_el.findtext(LOC_TAG) or "").strip()
+    if not loc:
+        return None
 
-    url_elements = root.findall("sm:url", NAMESPACES)
-    logger.info(f"Found {len(url_elements)} URL entries in sitemap")
+    # Locate <news:news> once, then read its direct children
+    news_el = url_el.find(NEWS_TAG)
+    if news_el is not None:
+        title = (news_el.findtext(NEWS_TITLE_TAG) or "").strip()
+        pub_date = (news_el.findtext(NEWS_DATE_TAG) or "").strip()
+        keywords_str = (news_el.findtext(NEWS_KEYWORDS_TAG) or "").strip()
+    else:
+        title = pub_date = keywords_str = ""
+    keywords = [k.strip() for k in keywords_str.split(",") if k.strip()] if keywords_str else []
 
-    for url_el in url_elements:
-        try:
-            loc = url_el.findtext("sm:loc", default="", namespaces=NAMESPACES).strip()
-            if not loc:
-                continue
+    if not title:
+        slug = loc.rstrip("/").split("/")[-1]
+        title = slug.replace("-", " ").title()
 
-            title = url_el.findtext("news:news/news:title", default="", namespaces=NAMESPACES).strip()
-            pub_date = url_el.findtext("news:news/news:publication_date", default="", namespaces=NAMESPACES).strip()
-            keywords_str = url_el.findtext("news:news/news:keywords", default="", namespaces=NAMESPACES).strip()
-            keywords = [k.strip() for k in keywords_str.split(",") if k.strip()] if keywords_str else []
+    return Article(url=loc, title=title, publication_date=pub_date, keywords=keywords)
 
-            if not title:
-                slug = loc.rstrip("/").split("/")[-1]
-                title = slug.replace("-", " ").title()
 
-            articles.append(Article(url=loc, title=title, publication_date=pub_date, keywords=keywords))
-        except Exception as e:
-            logger.warning(f"Error parsing URL element: {e}")
-            continue
+def parse_sitemap(source: Union[bytes, BinaryIO]) -> Optional[List[Article]]:
+    """
+    Stream <url> entries with iterparse, freeing each element once it is read.
+
+    `source` is raw XML bytes or a binary file-like object such as a streamed
+    response body, which is then parsed while it downloads.
+    Returns None if the XML is malformed or truncated, so a partial list is
+    never mistaken for the whole sitemap.
+    """
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+
+    articles = []
+    url_count = 0
+    try:
+        for _, url_el in etree.iterparse(source, events=("end",), tag=URL_TAG):
+            url_count += 1
+            try:
+                article = _parse_url_element(url_el)
+                if article:
+                    articles.append(article)
+            except Exception as e:
+                logger.warning("Error parsing URL element: %s", e)
+            finally:
+                # Drop the parsed element and its already-processed siblings
+                url_el.clear()
+                while url_el.getprevious() is not None:
+                    del url_el.getparent()[0]
+    except etree.XMLSyntaxError as e:
+        logger.error("Failed to parse sitemap XML after %d URL entries: %s", url_count, e)
+        return None
 
+    logger.info("Found %d URL entries in sitemap", url_count)
     return articles
 
 
 def fetch_and_parse(sitemap_url: str) -> Optional[List[Article]]:
-    xml_content = fetch_sitemap(sitemap_url)
-    if xml_content is None:
+    """Return parsed articles, [] if the sitemap is unchanged, or None on fetch or parse failure."""
+    response = fetch_sitemap(sitemap_url)
+    if response is None:
         return None
-    return parse_sitemap(xml_content)
+    if response is NOT_MODIFIED:
+        return []
+
+    with response:
+        # Let urllib3 undo gzip/deflate transfer encoding while lxml reads
+        response.raw.decode_content = True
+        try:
+            articles = parse_sitemap(response.raw)
+        except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+            logger.error("Failed to read sitemap body: %s", e)
+            articles = None
+
+    if articles is None:
+        # Validators were stored for a body we never fully parsed; fetch it again
+        # in full next time instead of getting a 304 for it
+        reset_conditional_cache()
+    return articles
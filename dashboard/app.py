@@ -5,24 +5,27 @@ Serves a web dashboard showing earnings, streaks, progress, and article history.
 Protected with a simple password query param.
 """
 
+import asyncio
 import os
+import secrets
+import time
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime, timedelta
 from typing import Optional
 
+import anyio.to_thread
+import jinja2
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import pool
+from psycopg2.extensions import connection as PgConnection
 import pytz
 import uvicorn
 from fastapi import FastAPI, Request, Query
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-
-app = FastAPI(title="Article Tracker Dashboard")
-
-# Static files & templates
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
 # Config from env
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
@@ -31,110 +34,240 @@ TIMEZONE = os.environ.get("TIMEZONE", "Asia/Jakarta")
 ARTICLE_VALUE = float(os.environ.get("ARTICLE_VALUE_USD", "12.5"))
 DAILY_TARGET = int(os.environ.get("DAILY_TARGET", "8"))
 MONTHLY_TARGET = int(os.environ.get("MONTHLY_TARGET", "240"))
+# Per worker. Stats fetches are serialized by the cache lock, so a worker
+# rarely needs more than one connection.
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN") or "1")
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX") or "2")
+# Default worker count is capped so workers x DB_POOL_MAX stays well inside
+# Postgres' max_connections on many-core hosts
+MAX_DEFAULT_WORKERS = 4
+THREAD_LIMIT = int(os.environ.get("THREAD_LIMIT") or "100")
+LIMIT_CONCURRENCY = int(os.environ.get("LIMIT_CONCURRENCY") or "200")
+
+DB_POOL: Optional[pool.ThreadedConnectionPool] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the connection pool on startup and close it on shutdown."""
+    global DB_POOL
+    # anyio's default of 40 worker threads caps threadpool work (DB fetches, static files)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREAD_LIMIT
+    DB_POOL = pool.ThreadedConnectionPool(
+        minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, dsn=DATABASE_URL, connection_factory=_PreparedConnection,
+    )
+    # Compile the page template once per worker; requests render it directly
+    app.state.index_tpl = templates.get_template("index.html")
+    try:
+        yield
+    finally:
+        DB_POOL.closeall()
+        DB_POOL = None
+
+
+class CachedStaticFiles(StaticFiles):
+    """Static files cached by browsers for a year; templates add ?v= to bust it."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+# Changes whenever a static file is modified, so cached copies are never stale
+STATIC_VERSION = str(max(
+    (int(entry.stat().st_mtime) for entry in os.scandir("static") if entry.is_file()),
+    default=0,
+))
 
+app = FastAPI(title="Article Tracker Dashboard", lifespan=lifespan)
+# The page embeds chart/heatmap/article data and compresses well
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
+# Static files & templates
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
+# Templates never change while the app runs: no mtime checks, unbounded
+# template cache, and compiled bytecode persisted across restarts.
+templates = jinja2.Environment(
+    loader=jinja2.FileSystemLoader("templates"),
+    autoescape=True,
+    auto_reload=False,
+    cache_size=-1,
+    bytecode_cache=jinja2.FileSystemBytecodeCache(),
+)
+templates.globals["static_version"] = STATIC_VERSION
+
+
+# Everything the dashboard page shows, as a single row: scalar stats, recent
+# articles as JSON, chart arrays and a date -> count heatmap object.
+# Parameters: $1 today, $2 first of month, $3 chart start, $4 heatmap start.
+DASHBOARD_QUERY = """
+WITH today AS (
+    SELECT article_count, earned FROM daily_stats WHERE date = $1
+),
+monthly AS (
+    SELECT article_count, earned FROM monthly_stats WHERE month = $2
+),
+totals AS (
+    SELECT COUNT(*) AS count, COALESCE(SUM(earning), 0) AS earned FROM articles
+),
+streak AS (
+    SELECT current_streak, last_publish_date FROM streak_info WHERE id = 1
+),
+recent AS (
+    SELECT title, url, detected_at, to_char(detected_at, 'Mon DD, HH24:MI') AS detected_label, earning
+    FROM articles ORDER BY detected_at DESC LIMIT 20
+),
+history AS (
+    SELECT date, article_count FROM daily_stats WHERE date >= $4
+)
+SELECT
+    COALESCE((SELECT article_count FROM today), 0) AS today_count,
+    COALESCE((SELECT earned FROM today), 0) AS today_earned,
+    COALESCE((SELECT article_count FROM monthly), 0) AS monthly_count,
+    COALESCE((SELECT earned FROM monthly), 0) AS monthly_earned,
+    (SELECT count FROM totals) AS total_count,
+    (SELECT earned FROM totals) AS total_earned,
+    COALESCE((SELECT current_streak FROM streak), 0) AS streak,
+    (SELECT last_publish_date FROM streak) AS last_publish,
+    (SELECT COALESCE(json_agg(json_build_object(
+        'title', title, 'url', url, 'detected_at', detected_label, 'earning', earning
+    ) ORDER BY detected_at DESC), '[]') FROM recent) AS recent_articles,
+    (SELECT COALESCE(array_agg(to_char(date, 'YYYY-MM-DD') ORDER BY date) FILTER (WHERE date >= $3), '{}') FROM history) AS chart_labels,
+    (SELECT COALESCE(array_agg(article_count ORDER BY date) FILTER (WHERE date >= $3), '{}') FROM history) AS chart_values,
+    (SELECT COALESCE(json_object_agg(date, article_count), '{}') FROM history) AS heatmap_data
+"""
+
+# Parsed and planned once per pooled connection (see get_db); requests only EXECUTE
+PREPARE_STATEMENTS = f"""
+PREPARE dash_stats(date, date, date, date) AS {DASHBOARD_QUERY};
+"""
+
+
+class _PreparedConnection(PgConnection):
+    """psycopg2 connection that remembers whether PREPARE_STATEMENTS ran on it."""
+    prepared = False
+
+
+@contextmanager
 def get_db():
-    return psycopg2.connect(DATABASE_URL)
+    """Borrow a pooled connection; broken connections are discarded, not reused."""
+    conn = DB_POOL.getconn()
+    broken = False
+    try:
+        if not conn.prepared:
+            with conn.cursor() as cur:
+                cur.execute(PREPARE_STATEMENTS)
+            conn.commit()
+            conn.prepared = True
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        DB_POOL.putconn(conn, close=broken or bool(conn.closed))
 
 
-def get_tz():
+def _load_tz():
     try:
         return pytz.timezone(TIMEZONE)
     except Exception:
         return pytz.UTC
 
 
+# Resolved once at import instead of on every request
+_TZ = _load_tz()
+
+
+def get_tz():
+    return _TZ
+
+
 def check_auth(key: str) -> bool:
     """Simple password check. Empty password = no auth required."""
     if not DASHBOARD_PASSWORD:
         return True
-    return key == DASHBOARD_PASSWORD
+    # Constant-time compare; bytes so non-ASCII keys don't raise
+    return secrets.compare_digest(key.encode(), DASHBOARD_PASSWORD.encode())
 
 
-# ─── Routes ──────────────────────────────────────────────────────────
+# ─── Cache ───────────────────────────────────────────────────────────
 
-@app.get("/", response_class=HTMLResponse)
-async def dashboard(request: Request, key: str = Query(default="")):
-    if not check_auth(key):
-        return HTMLResponse(
-            content="<h1>🔒 Access Denied</h1><p>Add <code>?key=YOUR_PASSWORD</code> to the URL.</p>",
-            status_code=403,
-        )
+# Stats only change when the bot records an article, so page views within
+# CACHE_TTL seconds share one DB fetch.
+CACHE_TTL = 15
+_CACHE: dict[tuple, tuple[float, dict]] = {}
+_CACHE_LOCK = asyncio.Lock()
 
-    tz = get_tz()
-    now = datetime.now(tz)
-    today = now.date()
-    first_of_month = now.replace(day=1).date()
 
-    conn = get_db()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Today stats
-            cur.execute("SELECT COALESCE(article_count, 0) as count, COALESCE(earned, 0) as earned FROM daily_stats WHERE date = %s", (today,))
-            today_row = cur.fetchone() or {"count": 0, "earned": 0}
+async def cached(key: tuple, build):
+    """
+    Return build() from the in-process TTL cache, computing it at most once per TTL.
 
-            # Monthly stats
-            cur.execute("SELECT COALESCE(SUM(article_count), 0) as count, COALESCE(SUM(earned), 0) as earned FROM daily_stats WHERE date >= %s", (first_of_month,))
-            monthly_row = cur.fetchone() or {"count": 0, "earned": 0}
+    build() does blocking psycopg2 I/O, so it runs in the threadpool and the
+    event loop keeps serving other requests meanwhile.
+    """
+    hit = _CACHE.get(key)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
 
-            # All-time stats
-            cur.execute("SELECT COUNT(*) as count, COALESCE(SUM(earning), 0) as earned FROM articles")
-            total_row = cur.fetchone() or {"count": 0, "earned": 0}
+    async with _CACHE_LOCK:
+        # Another request may have filled the entry while we waited
+        hit = _CACHE.get(key)
+        now = time.monotonic()
+        if hit and hit[0] > now:
+            return hit[1]
 
-            # Streak
-            cur.execute("SELECT current_streak, last_publish_date FROM streak_info WHERE id = 1")
-            streak_row = cur.fetchone() or {"current_streak": 0, "last_publish_date": None}
+        value = await run_in_threadpool(build)
+        now = time.monotonic()
+        for stale in [k for k, (expires, _) in _CACHE.items() if expires <= now]:
+            del _CACHE[stale]
+        _CACHE[key] = (now + CACHE_TTL, value)
+        return value
 
-            # Recent articles (last 20)
-            cur.execute("SELECT title, url, detected_at, earning FROM articles ORDER BY detected_at DESC LIMIT 20")
-            recent_articles = cur.fetchall()
 
-            # Daily chart data (last 30 days)
-            thirty_days_ago = today - timedelta(days=30)
-            cur.execute(
-                "SELECT date, article_count, earned FROM daily_stats WHERE date >= %s ORDER BY date ASC",
-                (thirty_days_ago,),
-            )
-            chart_rows = cur.fetchall()
+# ─── Data ────────────────────────────────────────────────────────────
 
-            # Streak heatmap data (last 90 days)
-            ninety_days_ago = today - timedelta(days=90)
-            cur.execute(
-                "SELECT date, article_count FROM daily_stats WHERE date >= %s ORDER BY date ASC",
-                (ninety_days_ago,),
-            )
-            heatmap_rows = cur.fetchall()
-    finally:
-        conn.close()
+def _stats_bundle(now: datetime) -> dict:
+    """
+    Fetch every figure served by the dashboard page and /api/stats.
 
-    # Build chart data
-    chart_labels = []
-    chart_values = []
-    for row in chart_rows:
-        chart_labels.append(row["date"].strftime("%b %d"))
-        chart_values.append(int(row["article_count"]))
+    The result is the page's template context; /api/stats serves a subset of
+    it, so both routes share one cached fetch.
+    """
+    today = now.date()
+    first_of_month = now.replace(day=1).date()
+    thirty_days_ago = today - timedelta(days=30)
+    ninety_days_ago = today - timedelta(days=90)
 
-    # Build heatmap data
-    heatmap_data = {}
-    for row in heatmap_rows:
-        heatmap_data[row["date"].isoformat()] = int(row["article_count"])
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "EXECUTE dash_stats(%s, %s, %s, %s)",
+                (today, first_of_month, thirty_days_ago, ninety_days_ago),
+            )
+            (
+                today_count, today_earned,
+                monthly_count, monthly_earned,
+                total_count, total_earned,
+                streak, last_publish,
+                recent_articles, chart_labels, chart_values, heatmap_data,
+            ) = cur.fetchone()
 
     # Progress percentages
-    today_count = int(today_row["count"])
-    monthly_count = int(monthly_row["count"])
+    today_count = int(today_count)
+    monthly_count = int(monthly_count)
     today_pct = min(100, int((today_count / DAILY_TARGET) * 100)) if DAILY_TARGET > 0 else 0
     monthly_pct = min(100, int((monthly_count / MONTHLY_TARGET) * 100)) if MONTHLY_TARGET > 0 else 0
     daily_remaining = max(0, DAILY_TARGET - today_count)
 
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "key": key,
+    return {
         "now": now.strftime("%Y-%m-%d %H:%M %Z"),
 
         # Earnings
-        "today_earned": float(today_row["earned"]),
-        "monthly_earned": float(monthly_row["earned"]),
-        "total_earned": float(total_row["earned"]),
+        "today_earned": float(today_earned),
+        "monthly_earned": float(monthly_earned),
+        "total_earned": float(total_earned),
         "article_value": ARTICLE_VALUE,
 
         # Counts
@@ -142,7 +275,7 @@ async def dashboard(request: Request, key: str = Query(default="")):
         "daily_target": DAILY_TARGET,
         "monthly_count": monthly_count,
         "monthly_target": MONTHLY_TARGET,
-        "total_count": int(total_row["count"]),
+        "total_count": int(total_count),
         "daily_remaining": daily_remaining,
 
         # Progress
@@ -150,8 +283,8 @@ async def dashboard(request: Request, key: str = Query(default="")):
         "monthly_pct": monthly_pct,
 
         # Streak
-        "streak": int(streak_row["current_streak"]),
-        "last_publish": streak_row["last_publish_date"],
+        "streak": int(streak),
+        "last_publish": last_publish,
 
         # Articles
         "recent_articles": recent_articles,
@@ -162,46 +295,70 @@ async def dashboard(request: Request, key: str = Query(default="")):
 
         # Heatmap
         "heatmap_data": heatmap_data,
-    })
+    }
 
 
-@app.get("/api/stats")
-async def api_stats(key: str = Query(default="")):
-    """JSON API endpoint for stats."""
+# ─── Routes ──────────────────────────────────────────────────────────
+
+class ApiStats(BaseModel):
+    """Subset of the stats bundle exposed as JSON."""
+    today_count: int
+    today_earned: float
+    monthly_count: int
+    monthly_earned: float
+    streak: int
+    daily_target: int
+    monthly_target: int
+
+
+@app.get("/", response_class=HTMLResponse)
+async def dashboard(request: Request, key: str = Query(default="")):
     if not check_auth(key):
-        return JSONResponse(status_code=403, content={"error": "unauthorized"})
+        return HTMLResponse(
+            content="<h1>🔒 Access Denied</h1><p>Add <code>?key=YOUR_PASSWORD</code> to the URL.</p>",
+            status_code=403,
+        )
 
-    tz = get_tz()
-    now = datetime.now(tz)
-    today = now.date()
-    first_of_month = now.replace(day=1).date()
+    now = datetime.now(get_tz())
+    context = await cached(("stats", now.date().isoformat()), lambda: _stats_bundle(now))
 
-    conn = get_db()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT COALESCE(article_count, 0), COALESCE(earned, 0) FROM daily_stats WHERE date = %s", (today,))
-            today_row = cur.fetchone() or (0, 0)
+    # Rendered in one piece: the page is ~20 KB and renders in well under a
+    # millisecond, while streaming Jinja's tiny chunks costs a threadpool hop and
+    # a gzip flush each
+    return HTMLResponse(request.app.state.index_tpl.render(key=key, **context))
 
-            cur.execute("SELECT COALESCE(SUM(article_count), 0), COALESCE(SUM(earned), 0) FROM daily_stats WHERE date >= %s", (first_of_month,))
-            monthly_row = cur.fetchone() or (0, 0)
 
-            cur.execute("SELECT current_streak FROM streak_info WHERE id = 1")
-            streak_row = cur.fetchone() or (0,)
-    finally:
-        conn.close()
+# With a response model, FastAPI serializes straight to JSON bytes via Pydantic
+@app.get("/api/stats", response_model=ApiStats)
+async def api_stats(key: str = Query(default="")):
+    """JSON API endpoint for stats."""
+    if not check_auth(key):
+        return JSONResponse(status_code=403, content={"error": "unauthorized"})
 
-    return {
-        "today_count": today_row[0],
-        "today_earned": float(today_row[1]),
-        "monthly_count": monthly_row[0],
-        "monthly_earned": float(monthly_row[1]),
-        "streak": streak_row[0],
-        "daily_target": DAILY_TARGET,
-        "monthly_target": MONTHLY_TARGET,
-    }
+    now = datetime.now(get_tz())
+    stats = await cached(("stats", now.date().isoformat()), lambda: _stats_bundle(now))
+
+    return {field: stats[field] for field in ApiStats.model_fields}
 
 
 if __name__ == "__main__":
     host = os.environ.get("DASHBOARD_HOST", "0.0.0.0")
     port = int(os.environ.get("DASHBOARD_PORT", "8080"))
-    uvicorn.run(app, host=host, port=port, log_level="info")
+    workers = int(os.environ.get("UVICORN_WORKERS") or min((os.cpu_count() or 1) * 2 + 1, MAX_DEFAULT_WORKERS))
+    # Import-string form so uvicorn can spawn worker processes; each worker
+    # opens its own DB pool in lifespan()
+    uvicorn.run(
+        "app:app",
+        host=host,
+        port=port,
+        workers=workers,
+        log_level="info",
+        loop="uvloop",       # libuv event loop
+        http="httptools",    # C HTTP parser instead of h11
+        proxy_headers=True,
+        # Shed load: past this many open connections/tasks per worker, uvicorn
+        # answers 503 immediately instead of queueing requests behind the DB pool
+        limit_concurrency=LIMIT_CONCURRENCY,
+        backlog=2048,
+        timeout_keep_alive=5,
+    )